@@ -25,8 +25,16 @@
 # Jupyter notebooks support a reproducible workflow, by allowing graphics to be embedded directly in a notebook. Now, the graphic and the code that generated it live in the same file, adjacent to one another. To make graphics show up in the Jupyter notebook, we have to specify that `matplotlib` (the main graphics library in Python) should output the graphic to the "inline" backend, as opposed to, for example, a backend that makes the graphic appear in a new window. To specify a backend for `matplotlib`, we run a so-called **magic command** (or just **magic**, for short). Magic commands modify the behavior of a notebook or an individual cell. For example, the `%timeit` magic, which we will use later in this book, times how long it takes to run a line of code. You can recognize magics because they are preceded by `%` or `%%`. For a full list of magics, consult [the documentation](https://ipython.readthedocs.io/en/stable/interactive/magics.html).
 #
 # The `%matplotlib` magic below allows you to specify a backend. In general, if you plan to create graphics in the Jupyter notebook, then the following magic should be the first line in your notebook.
+#
+# Every graphic that is embedded in the notebook has to be saved as an image first. The `%config` magic and the `figure.dpi` setting below ask for ordinary PNG images (not double-resolution "retina" images) at a modest resolution, which keeps each plot quick to draw and the notebook small.
 
+# +
 # %matplotlib inline
+# %config InlineBackend.figure_format = "png"
+
+import matplotlib.pyplot as plt
+plt.rcParams["figure.dpi"] = 80
+# -
 
 # ## Visualizing Quantitative Variables
 #
@@ -37,33 +45,80 @@
 # The standard visualization for a single quantitative variable is the **histogram**. A histogram sorts the values into bins and uses bars to represent the number of values in each bin.
 #
 # To make a histogram, we call the `.plot.hist()` method of the selected variable. All of the plotting functions in `pandas` are preceded by `.plot`.
+#
+# (To avoid downloading the data every time we re-run the notebook, we read it with a small function `cached_csv()`, which saves a copy of the file on your computer the first time and reads that copy afterwards. We also ask `pandas` to parse the file with the much faster `pyarrow` engine, which requires the `pyarrow` package to be installed.)
 
 # +
 import pandas as pd
-df = pd.read_csv(
-    "https://raw.githubusercontent.com/dlsun/data-science-book/master/data/titanic.csv"
+import hashlib
+from pathlib import Path
+from urllib.request import urlretrieve
+
+def cached_csv(url, **kwargs):
+    # Download the file the first time it is requested, then read the local copy.
+    path = Path(
+        "~/.cache/ds-book", hashlib.sha1(url.encode()).hexdigest() + ".csv"
+    ).expanduser()
+    if not path.exists():
+        path.parent.mkdir(parents=True, exist_ok=True)
+        partial = path.with_suffix(".part")
+        urlretrieve(url, partial)
+        partial.replace(path)
+    return pd.read_csv(path, **kwargs)
+
+df = cached_csv(
+    "https://raw.githubusercontent.com/dlsun/data-science-book/master/data/titanic.csv",
+    engine="pyarrow",
+    dtype_backend="pyarrow",
+    # Store the numeric variables we plot in the smallest types that fit them.
+    dtype={
+        "pclass": "int8[pyarrow]",
+        "sibsp": "int8[pyarrow]",
+        "parch": "int8[pyarrow]",
+        "age": "float32[pyarrow]",
+        "fare": "float32[pyarrow]"
+    }
 )
 
 df.fare.plot.hist()
 # -
 
 # It seems that we did not get enough resolution to really determine what is going on at the lower end of the scale. Let's request more bins.
+#
+# Since we will be drawing this histogram several times in this section, we will compute the bin counts ourselves using `np.histogram()` and draw them as bars using `plt.bar()`. This is all that `.plot.hist()` does under the hood, but now the counting happens in a single fast loop inside `numpy`.
+
+# +
+import numpy as np
 
-df.fare.plot.hist(bins=50)
+def fast_hist(s, bins=50, density=False, **kwargs):
+    # Count the (non-missing) values in each bin.
+    counts, edges = np.histogram(s.dropna().to_numpy(), bins=bins)
+    # Rescale the counts so that the total area of the bars is 1.
+    if density:
+        counts = counts / (counts.sum() * np.diff(edges))
+    return plt.bar(edges[:-1], counts, width=np.diff(edges), align="edge", **kwargs)
+
+fast_hist(df.fare, 50)
+# -
 
 # From this graph, we see a concentration of values around 10-30 (which we previously identified as the "center") and a spread of about 30-50 (which we previously identified as the "spread"). We also see the outlier who paid more than £500. We also see features that were not obvious before: the skewed shape of the distribution, the gap between £300 and £500, and so on. This single picture has managed to convey more information than a dozen summary statistics.
 
-# We might want to plot more than one histogram on the same graphic to make for easy comparison. To do this, we simply make multiple calls to plotting functions within the same cell. For example, if we wanted to compare the distributions of the number of siblings/spouses and the number of parents/children that accompanied passengers, we could call `.plot.hist()` twice.
+# We might want to plot more than one histogram on the same graphic to make for easy comparison. To do this, we simply make multiple calls to plotting functions within the same cell. For example, if we wanted to compare the distributions of the number of siblings/spouses and the number of parents/children that accompanied passengers, we could call `fast_hist()` twice. Both variables are whole numbers, so we give the two histograms the same bins, one for each whole number from 0 to the largest value of either variable. That way, the bars of the two histograms line up exactly.
+
+# +
+bins = np.arange(0, max(df.sibsp.max(), df.parch.max()) + 2)
 
-df.sibsp.plot.hist()
-df.parch.plot.hist()
+fast_hist(df.sibsp, bins)
+fast_hist(df.parch, bins)
+# -
 
-# Notice that `pandas` automatically plotted the two histograms using different colors. There are two problems with this plot. First, we don't know which color corresponds to which variable. Second, we cannot see the blue histogram underneath the orange histogram because the colors are opaque.
+# Notice that `matplotlib` automatically plotted the two histograms using different colors. There are two problems with this plot. First, we don't know which color corresponds to which variable. Second, we cannot see the blue histogram underneath the orange histogram because the colors are opaque.
 #
-# To solve the first problem, we add a legend for each variable by specifying `legend=True`. To solve the second problem, we set the transparency `alpha`, which is a number between 0 and 1, with 0 being perfectly transparent and 1 being completely opaque. Try varying `alpha` to get a feel for what it does.
+# To solve the first problem, we give each histogram a `label` and add a legend by calling `plt.legend()`. (With `.plot.hist()`, you would simply specify `legend=True`.) To solve the second problem, we set the transparency `alpha`, which is a number between 0 and 1, with 0 being perfectly transparent and 1 being completely opaque. Try varying `alpha` to get a feel for what it does.
 
-df.sibsp.plot.hist(legend=True, alpha=.5)
-df.parch.plot.hist(legend=True, alpha=.5)
+fast_hist(df.sibsp, bins, label="sibsp", alpha=.5)
+fast_hist(df.parch, bins, label="parch", alpha=.5)
+plt.legend()
 
 # The parents/children histogram is higher at 0 and 2, but the sibling/spouse histogram is higher at 1. This makes sense because
 #
@@ -76,21 +131,47 @@ df.parch.plot.hist(legend=True, alpha=.5)
 
 df.fare.plot.density()
 
-# The x-axis is too wide. (You cannot have negative fares.) We can set the limits of the x-axis manually using the `xlim` argument.
+# The x-axis is too wide. (You cannot have negative fares.) We can set the limits of the x-axis manually using the `xlim` argument, as in `df.fare.plot.density(xlim=(0, 600))`.
+#
+# However, every call to `.plot.density()` fits the density to the data all over again, and fitting a density is much more work than counting values in bins. Since we are going to draw this same curve several times, let's fit it once, evaluate it at 1000 points between 0 and 600, and save the result. The `lru_cache` decorator remembers the output of a function for each input it has seen, so later calls with the same arguments return the saved curve immediately. We pass the data itself (as raw bytes) to the cached function, not just the name of the column. That way, if `df` changes, the curve is fit again instead of coming from the cache.
 
-df.fare.plot.density(xlim=(0, 600))
+# +
+from functools import lru_cache
+import scipy.stats
+
+@lru_cache(maxsize=8)
+def _density_curve(data, lo, hi, n):
+    # Fit the density to the data and evaluate it at n points between lo and hi.
+    kde = scipy.stats.gaussian_kde(np.frombuffer(data))
+    xs = np.linspace(lo, hi, n)
+    ys = kde(xs)
+    # Every caller gets these same arrays back, so make them read-only.
+    xs.flags.writeable = False
+    ys.flags.writeable = False
+    return xs, ys
+
+def density_curve(values, lo, hi, n=1000):
+    # Bytes can be compared and hashed, so they can be used as a cache key.
+    data = values.dropna().to_numpy(dtype=np.float64).tobytes()
+    return _density_curve(data, lo, hi, n)
+
+xs, ys = density_curve(df.fare, 0, 600)
+plt.plot(xs, ys)
+# -
 
 # Let's superimpose this density curve on top of the histogram, by making two calls to plotting functions:
 
-df.fare.plot.hist(bins=50)
-df.fare.plot.density(xlim=(0, 600))
+fast_hist(df.fare, 50)
+xs, ys = density_curve(df.fare, 0, 600)
+plt.plot(xs, ys, color="C1")
 
 # If you squint at this plot, you will see an orange line at the bottom of the plot. This is supposed to be the density. But why does it appear as a flat line? The y-axis offers a hint. When we made the density plot earlier, the y-axis extended from 0 to about 0.02. Now the y-axis extends all the way to 500. On such a scale, a curve that fluctuates between 0 and 0.02 will appear to be a flat line!
 #
 # The problem is that the histogram and the density are currently on different scales. By default, histograms display counts, while densities are defined so that the total area under the curve is 1. To be able to display a histogram and density on the same graph, we have to normalize the histogram so that the total area of the bars is 1. We can do this by setting the option `density=True`.
 
-df.fare.plot.hist(bins=50, density=True)
-df.fare.plot.density(xlim=(0, 600))
+fast_hist(df.fare, 50, density=True)
+xs, ys = density_curve(df.fare, 0, 600)
+plt.plot(xs, ys, color="C1")
 
 # Now we can clearly see how the density smooths the histogram. It does a pretty good job for the most part, but it "oversmooths" near 0, missing the spike.
 
@@ -131,9 +212,9 @@ pclass_counts.plot.bar()
 
 # The bars in a bar graph are also not guaranteed to be ordered in any particular way. `pandas` will plot the bars in the same order as they appeared in the `Series`. Since `.value_counts()` sorts the categories by frequency, the bar graph was sorted in the same order.
 
-# In the case of the passenger class, we probably want the bars in the order 1st, 2nd, 3rd. To do this, we can sort the index of the value counts before passing them to `.plot.bar()`.
+# In the case of the passenger class, we probably want the bars in the order 1st, 2nd, 3rd. To do this, we can sort the index of the value counts before passing them to `.plot.bar()`. Since we are going to sort by the index anyway, there is no point in having `.value_counts()` sort the categories by frequency first, so we turn that off with `sort=False`.
 
-pclass_counts.sort_index(inplace=True)
+pclass_counts = df.pclass.value_counts(sort=False).sort_index()
 pclass_counts.plot.bar()
 pclass_counts
 
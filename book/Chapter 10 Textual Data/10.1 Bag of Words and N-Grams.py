@@ -25,10 +25,29 @@
 import pandas as pd
 pd.options.display.max_rows = 10
 
-texts = pd.read_csv(
+import hashlib
+from pathlib import Path
+from urllib.request import urlretrieve
+
+def cached_csv(url, **kwargs):
+    # Download the file the first time it is requested, then read the local copy.
+    path = Path(
+        "~/.cache/ds-book", hashlib.sha1(url.encode()).hexdigest() + ".csv"
+    ).expanduser()
+    if not path.exists():
+        path.parent.mkdir(parents=True, exist_ok=True)
+        partial = path.with_suffix(".part")
+        urlretrieve(url, partial)
+        partial.replace(path)
+    return pd.read_csv(path, **kwargs)
+
+texts = cached_csv(
     "https://raw.githubusercontent.com/dlsun/data-science-book/master/data/SMSSpamCollection.txt", 
     sep="\t",
-    names=["label", "text"]
+    names=["label", "text"],
+    # Store the text as Arrow strings. (We keep the default parser: some
+    # messages contain quote characters, which the pyarrow parser rejects.)
+    dtype={"label": "category", "text": "string[pyarrow]"}
 )
 texts
 # -
@@ -56,22 +75,60 @@ texts["text"].str.split()
 # We can **normalize** the text for case by 
 #
 # - converting all of the characters to lowercase, using the `.str.lower()` method
-# - stripping punctuation using a regular expression. The regular expression `[^\w\s]` tells Python to look for any pattern that is not (`^`) either an alphanumeric character (`\w`) or whitespace (`\s`). That is, it will detect any occurrence of punctuation. We will then use the `.str.replace()` method to replace all detected occurrences with the empty string, effectively removing all punctuation from the string.
+# - stripping punctuation using a translation table. By punctuation, we mean any character that matches the regular expression `[^\w\s]`: anything that is not a letter, digit, underscore, or whitespace. We find every such character that appears in the corpus, and the `str.maketrans()` function builds a table that tells Python to replace each of them with `None`. We will then use the `.str.translate()` method to look up every character of every message in this table, effectively removing all punctuation from the string. (We could also remove the punctuation by running the regular expression itself, with `.str.replace()`, but a table lookup is much faster than running a regular expression on every message. Python's `string.punctuation` would not work here: it only contains ASCII punctuation, so it would miss characters like the pound sign and curly quotes.)
 #
 # By chaining these commands together, we obtain a list, to which we can apply the `Counter` to obtain the bag of words representation.
 
 # +
+import re
+
+# Every character in the corpus that the regular expression counts as punctuation.
+chars = set("".join(texts["text"].str.lower()))
+punct_table = str.maketrans({c: None for c in chars if re.fullmatch(r"[^\w\s]", c)})
+
 words = (
     texts["text"].
     str.lower().
-    str.replace("[^\w\s]", "").
+    str.translate(punct_table).
     str.split()
 )
 
 words
 # -
 
-words.apply(Counter)
+# Now we could call `words.apply(Counter)` to get the bag of words for each message. But that would build over 5000 separate `Counter`s, one word at a time, in Python. Scikit-Learn's `CountVectorizer` (which we will study in detail in the next section) does exactly the same counting in optimized code. To get exactly the same words, we give it the same normalized text, and the `token_pattern` below tells it to treat every run of non-whitespace characters as a word, just like `.str.split()` does.
+
+# +
+from sklearn.feature_extraction.text import CountVectorizer
+
+vec = CountVectorizer(lowercase=False, token_pattern=r"\S+")
+counts = vec.fit_transform(
+    texts["text"].str.lower().str.translate(punct_table)
+)
+vocab = vec.get_feature_names_out()
+counts
+
+
+# -
+
+# The counts are stored in a compact form that only records the words that actually appear in each message. When we want to see the bag of words for a particular message as a dictionary, we can look up the words and their counts in that message's row.
+
+# +
+def bag_of_words(i):
+    row = counts[i]
+    return Counter(dict(zip(vocab[row.indices].tolist(), row.data.tolist())))
+
+bag_of_words(0)
+# -
+
+# Sometimes we only want a single bag of words for the entire corpus---for example, to find the most common words. Then there is no need for a separate `Counter` for each message. Instead, we can chain all of the lists of words together into one long stream of words, using `chain.from_iterable()` from the `itertools` module, and feed that stream to a single `Counter`.
+
+# +
+from itertools import chain
+
+corpus_counts = Counter(chain.from_iterable(words))
+corpus_counts.most_common(10)
+# -
 
 # ## N-Grams
 #
@@ -104,6 +161,28 @@ def get_bigrams(words):
 words.apply(get_bigrams).apply(Counter)
 # -
 
+# If we only want to know which bigrams are most common in the entire corpus, we do not need a separate `Counter` for every message. Instead, we can give every distinct word an integer code using `pd.factorize()`, and then pack the two codes of each bigram into a single 64-bit integer (the first code in the upper 32 bits and the second code in the lower 32 bits). Counting bigrams then amounts to counting integers, which `np.unique()` can do in a single sort. Note that we must drop the "bigrams" that span two different messages.
+
+# +
+import numpy as np
+
+# One row per word, indexed by the message it came from.
+tokens = words.explode().dropna()
+codes, uniques = pd.factorize(tokens)
+codes = codes.astype(np.int64)
+
+# Pack the codes of consecutive words into one integer per bigram.
+same_message = tokens.index[:-1] == tokens.index[1:]
+packed = ((codes[:-1] << 32) | codes[1:])[same_message]
+packed, freqs = np.unique(packed, return_counts=True)
+
+bigram_counts = pd.Series(
+    freqs,
+    index=[uniques[packed >> 32], uniques[packed & 0xFFFFFFFF]]
+).sort_values(ascending=False)
+bigram_counts
+# -
+
 # Instead of taking 2 words at a time, we could take 3, 4, or, in general, $n$ words. 
 # A tuple of $n$ consecutive words is called an $n$-gram, and we can convert any document to a "bag of $n$-grams" representation. 
 #
@@ -120,11 +199,33 @@ words.apply(get_bigrams).apply(Counter)
 # -
 
 # **Exercise 2.** The text of _Green Eggs and Ham_ by Dr. Seuss can be found in (`https://raw.githubusercontent.com/dlsun/data-science-book/master/data/drseuss/greeneggsandham.txt`). Read in this file and convert this "document" into a bag of trigrams (3-grams) representation. Which trigram appears most often? Some code has been provided to get you started.
+#
+# The code below reads the file one line at a time, instead of loading the whole book into memory. `tokens` is a _generator_ that produces the normalized words one at a time, and `ngrams()` turns any stream of words into a stream of $n$-grams, without making copies of the list of words like `words[:-1]` and `words[1:]` do. Note that the words can only be read while the file is still open, so do your counting inside the `with` block.
+#
+# (_Hint:_ For a book much longer than _Green Eggs and Ham_, counting trigrams with a `Counter` means hashing millions of tuples. Instead, you can use the same trick that we used above to count bigrams. Collect the words into a list and encode them as integers with `codes, uniques = pd.factorize(words)`. Then pack each trigram into one 64-bit integer, 21 bits per word: `(codes[:-2].astype(np.uint64) << 42) | (codes[1:-1].astype(np.uint64) << 21) | codes[2:].astype(np.uint64)`. Count these integers with `np.unique(..., return_counts=True)`, and unpack the most common one with `>> 42`, `>> 21`, and `& (2**21 - 1)`. This works as long as the vocabulary has fewer than $2^{21}$, or about 2 million, distinct words.)
+
+# +
+import string
+import urllib.request
+from itertools import islice, tee
+
+def ngrams(tokens, n):
+    # Make n copies of the stream of tokens and advance the i-th copy by i
+    # tokens, so that zipping the copies together lines up consecutive words.
+    streams = tee(tokens, n)
+    for i, stream in enumerate(streams):
+        next(islice(stream, i, i), None)
+    return zip(*streams)
 
 # TYPE YOUR CODE HERE.
-with open(
-    "https://raw.githubusercontent.com/dlsun/data-science-book/master/data/drseuss/greeneggsandham.txt",
-    "r"
+with urllib.request.urlopen(
+    "https://raw.githubusercontent.com/dlsun/data-science-book/master/data/drseuss/greeneggsandham.txt"
 ) as f:
-    for line in f:
-        pass
+    tokens = (
+        word.lower().strip(string.punctuation)
+        for line in f
+        for word in line.decode("utf-8").split()
+        # Skip "words" that are only punctuation, like "-" or "...".
+        if word.strip(string.punctuation)
+    )
+    trigrams = ngrams(tokens, 3)
@@ -25,10 +25,29 @@ import pandas as pd
 pd.options.display.max_rows = 10
 from collections import Counter
 
-sms = pd.read_csv(
+import hashlib
+from pathlib import Path
+from urllib.request import urlretrieve
+
+def cached_csv(url, **kwargs):
+    # Download the file the first time it is requested, then read the local copy.
+    path = Path(
+        "~/.cache/ds-book", hashlib.sha1(url.encode()).hexdigest() + ".csv"
+    ).expanduser()
+    if not path.exists():
+        path.parent.mkdir(parents=True, exist_ok=True)
+        partial = path.with_suffix(".part")
+        urlretrieve(url, partial)
+        partial.replace(path)
+    return pd.read_csv(path, **kwargs)
+
+sms = cached_csv(
     "https://raw.githubusercontent.com/dlsun/data-science-book/master/data/SMSSpamCollection.txt", 
     sep="\t",
-    names=["label", "text"]
+    names=["label", "text"],
+    # Store the text as Arrow strings. (We keep the default parser: some
+    # messages contain quote characters, which the pyarrow parser rejects.)
+    dtype={"label": "category", "text": "string[pyarrow]"}
 )
 # -
 
@@ -45,47 +64,55 @@ sms = pd.read_csv(
 # Let's obtain the term-frequency matrix for the text message corpus. But let's restrict to just the first 100 messages and just words containing only letters. (Otherwise, we end up with "words" that are phone numbers and addresses.)
 
 # +
+import re
 from collections import Counter
 
-bag_of_words = (
-    sms.loc[:100, "text"].
-    str.lower().
-    str.replace("[^A-Za-z\s]", "").
-    str.split()
-).apply(Counter)
+# A word is a run of (lowercase) letters.
+word_pattern = re.compile(r"[a-z]+")
+
+def get_bag_of_words(text):
+    # Find and count the words of one message in a single pass.
+    return Counter(word_pattern.findall(text.lower()))
+
+bag_of_words = sms.loc[:100, "text"].map(get_bag_of_words)
 
 bag_of_words
 # -
 
-# To make a term-frequency matrix out of this data, we need to convert it to a `DataFrame`, where each column represents a word and each row a document---and the cells contain the count of that word in the document.
+# To make a term-frequency matrix out of this data, we need a table where each column represents a word and each row a document---and the cells contain the count of that word in the document. Scikit-Learn's `DictVectorizer` does exactly this: it takes in a list of dictionaries (like our `Counter`s) and returns a matrix with one column for every key. We convert the matrix to a `DataFrame` just to display it with the words as column labels. (This matrix only has 101 rows, so it is safe to convert it to an ordinary array with `.toarray()`.)
 
-tf = pd.DataFrame(list(bag_of_words))
-tf
+# +
+from sklearn.feature_extraction import DictVectorizer
 
-# Although there are a few numbers in this matrix, it is mostly NaNs. That simply means that the word did not appear in the dictionary for that document. In other words, a NaN really means a count of 0. So let's replace the NaNs by 0s.
+dv = DictVectorizer(sparse=True, dtype=np.float32)
+tf = dv.fit_transform(bag_of_words)
+vocab = dv.get_feature_names_out()
 
-tf = tf.fillna(0)
-tf
+pd.DataFrame(tf.toarray(), columns=vocab)
+# -
 
+# Although there are a few numbers in this matrix, it is mostly 0s. That simply means that the word did not appear in the dictionary for that document. (If we had instead converted the `Counter`s directly into a `DataFrame`, using `pd.DataFrame(list(bag_of_words))`, these entries would have shown up as NaNs, which we would have had to replace by 0s.)
+#
 # You might be tempted at this point to run the same code on the entire corpus of text messages. But the number of columns (i.e., the size of the vocabulary) quickly grows out of control. There are about 9000 unique words in the entire corpus, and storing that many columns is on the edge of what `pandas` can handle.
 #
-# But we observed above that _most of the entries in this matrix are zero._ Instead of storing all the entries in this matrix, we can simply store the locations (row and column index) of the non-zero elements and their values. All of the remaining entries are assumed to be zeroes. This is called a **sparse** representation of the matrix.
+# But we observed above that _most of the entries in this matrix are zero._ Instead of storing all the entries in this matrix, we can simply store the locations (row and column index) of the non-zero elements and their values. All of the remaining entries are assumed to be zeroes. This is called a **sparse** representation of the matrix. In fact, this is how `DictVectorizer` stored `tf` above, because we specified `sparse=True`.
 #
-# To get a sparse representation of the term-frequency matrix, we use the `CountVectorizer` object in Scikit-Learn.  This object takes in a list of strings, splits each string into words, counts them, and returns the term-frequency matrix. By default, it converts all letters to lowercase and strips punctuation, although this behavior can be customized.
+# To get a sparse representation of the term-frequency matrix directly from the raw text, we use the `CountVectorizer` object in Scikit-Learn.  This object takes in a list of strings, splits each string into words, counts them, and returns the term-frequency matrix. By default, it converts all letters to lowercase and strips punctuation, although this behavior can be customized.
 
 # +
 from sklearn.feature_extraction.text import CountVectorizer
 
 vec = CountVectorizer()
 vec.fit(sms["text"]) # This determines the vocabulary.
-tf_sparse = vec.transform(sms["text"])
+# We look up documents by row, so make sure the matrix is stored by row (CSR).
+tf_sparse = vec.transform(sms["text"]).tocsr()
 # -
 
-# A sparse matrix can be converted to a **dense** matrix if necessary, using the `.todense()` method. But be careful. If the matrix is large, you do not want to do this!
+# A sparse matrix can be converted to a **dense** matrix if necessary, using the `.todense()` method. But be careful. If the matrix is large, you do not want to do this! This matrix has over 5000 rows and about 9000 columns, so storing every entry would take hundreds of megabytes. To take a look at it, we only convert the first 5 rows, and we store them in a `DataFrame` with sparse columns, labeled by the words. (This is for display only; do not densify the full matrix.)
 
-tf_sparse.todense()
+pd.DataFrame.sparse.from_spmatrix(tf_sparse[:5], columns=vec.get_feature_names_out())
 
-# Notice that the resulting object is no longer a `DataFrame`. It is simply a matrix of numbers. Each column corresponds to a word (and, if necessary, we can find the mapping between words and columns in `vec.vocabulary_`). But the word counts themselves are not of primary interest. We now have a completely numerical representation of every text document that can be passed into a machine learning model, like $k$-nearest neighbors.
+# Notice that `tf_sparse` itself is not a `DataFrame`. It is simply a matrix of numbers. Each column corresponds to a word (and, if necessary, we can find the mapping between words and columns in `vec.vocabulary_`). But the word counts themselves are not of primary interest. We now have a completely numerical representation of every text document that can be passed into a machine learning model, like $k$-nearest neighbors.
 
 # We can even count bigrams using `CountVectorizer` by specifying `ngram_range`. If we wanted both unigrams (i.e., individual words) and the bigrams, then we would specify `ngram_range=(1, 2)`. If we want just the bigrams, then we would specify `ngram_range=(2, 2)`. Let's do the latter:
 
@@ -115,25 +142,31 @@ vec.transform(sms["text"])
 
 # Get document frequencies 
 # (How many documents does each word appear in?)
-df = (tf > 0).sum(axis=0)
+# Each non-zero entry of tf is one document containing the word,
+# so we just count how many entries are stored in each column.
+df = pd.Series(
+    np.bincount(tf.indices, minlength=tf.shape[1]).astype(np.float32),
+    index=vocab
+)
 df
 
 # Get IDFs
-idf = np.log(len(tf) / df)
+idf = np.log(tf.shape[0] / df)
 idf
 
 # Calculate TF-IDFs
-tf_idf = tf * idf
-tf_idf
+tf_idf = tf.multiply(idf.to_numpy()).tocsr()
+pd.DataFrame(tf_idf.toarray(), columns=vocab)
 
 # We will not generally implement TF-IDF from scratch, like we did above. Instead, we will use Scikit-Learn's `TfidfVectorizer`, which operates similarly to `CountVectorizer`, except that it returns a matrix of the TF-IDF weights.
 
 # +
 from sklearn.feature_extraction.text import TfidfVectorizer
 
-vec = TfidfVectorizer(norm=None) # Do not normalize.
+vec = TfidfVectorizer(norm=None, # Do not normalize.
+                      dtype=np.float32)
 vec.fit(sms["text"]) # This determines the vocabulary.
-tf_idf_sparse = vec.transform(sms["text"])
+tf_idf_sparse = vec.transform(sms["text"]).tocsr()
 tf_idf_sparse
 # -
 
@@ -174,41 +207,33 @@ tf_idf_sparse
 
 # +
 # Calculate the numerator.
-a = tf_idf_sparse[0, :]
-b = tf_idf_sparse[2, :]
-dot = a.multiply(b).sum()
+a = tf_idf_sparse.getrow(0)
+b = tf_idf_sparse.getrow(2)
+dot = a.dot(b.T)[0, 0]
 
 # Calculate the terms in the denominator.
-a_len = np.sqrt(a.multiply(a).sum())
-b_len = np.sqrt(b.multiply(b).sum())
+a_len = np.sqrt(a.dot(a.T)[0, 0])
+b_len = np.sqrt(b.dot(b.T)[0, 0])
 
 # Cosine similarity is their ratio.
 dot / (a_len * b_len)
 # -
 
-# These two vectors are not very similar, as evidenced by their low cosine similarity (close to 0). Let's try to find the most similar documents in the corpus to the 0th text message---in other words, its nearest neighbors. To do this, we will take advantage of _broadcasting_: we will multiply a TF-IDF vector (for the 0th text message) by the entire TF-IDF matrix and calculate the sum over the columns. This will give us a vector of dot products.
-
-# Calculate the numerators.
-a = tf_idf_sparse[0, :]
-B = tf_idf_sparse
-dot = a.multiply(B).sum(axis=1)
-dot
+# These two vectors are not very similar, as evidenced by their low cosine similarity (close to 0). Let's try to find the most similar documents in the corpus to the 0th text message---in other words, its nearest neighbors. To do this, we need the cosine similarity between the 0th text message and every text message in the corpus. Scikit-Learn's `cosine_similarity` function calculates all of them in one call, using sparse matrix operations instead of a loop over the messages.
 
-# Calculate the denominators.
-a_len = np.sqrt(a.multiply(a).sum())
-b_len = np.sqrt(B.multiply(B).sum(axis=1))
-print(a_len)
-b_len
+# +
+from sklearn.metrics.pairwise import cosine_similarity
 
-# Calculate their ratio to obtain cosine similarities.
-dot / (a_len * b_len)
+cos = cosine_similarity(tf_idf_sparse, tf_idf_sparse[0]).ravel()
+cos
+# -
 
-# The warning message is the result of dividing by zero. (Some text messages have no words when you remove all the punctutation.)
+# Some text messages have no words when you remove all the punctuation, so their length is 0. Instead of dividing by zero, `cosine_similarity` simply reports a cosine similarity of 0 for these messages.
 #
-# Now let's put this matrix into a `DataFrame` so that we can easily sort the values in descending order.
+# Now let's find the texts with the highest cosine similarities. We only need the top 10, so there is no need to sort all of the cosine similarities. Instead, we put them in a `Series` and call `.nlargest(10)`, which picks out the 10 largest values and only sorts those.
 
-cos_similarities = pd.DataFrame(dot / (a_len * b_len))[0]
-most_similar = cos_similarities.sort_values(ascending=False)
+cos_similarities = pd.Series(cos)
+most_similar = cos_similarities.nlargest(10)
 most_similar
 
 # Obviously, the most similar text to the 0th text (with a perfect cosine similarity of 1.0) is itself. But other similar texts include 5511, 1351, 3713, and 605. Let's go back to the original data and read some of the other similar texts.
@@ -253,18 +278,31 @@ for i, text in sms["text"][most_similar.index[:10]].items():
 # **Exercise 4.** Write a function `predict_spam()` that takes in a new text message and predicts whether or not it is spam using $9$-nearest neighbors on the text messages data set above. Some code has been provided for you. Use cosine distance ($= 1 - \text{cosine similarity}$) as your distance metric. (Because `KNeighborsClassifier` in Scikit-Learn does not support cosine distance, you will have to implement $k$-nearest neighbors from scratch.)
 #
 # Use your model to predict whether the text messages "meet you at jurong place" and "free cash" are spam or not.
+#
+# (_Hint:_ A training text can only have a nonzero cosine similarity with the new text if they share a word. If you store a copy of the training data by column, with `X_train_csc = X_train.tocsc()`, then selecting the columns for the words in the new text, `X_train_csc[:, x_new.indices]`, and looking at the `.indices` of the result tells you which training texts contain those words. You only need to calculate the cosine similarities of these texts.)
 
 # +
 # TYPE YOUR CODE HERE.
-vec = TfidfVectorizer(norm=False)
+vec = TfidfVectorizer(norm=None, dtype=np.float32)
 vec.fit(sms["text"])
-X_train = vec.transform(sms["text"])
-X_train_len = np.sqrt(X_train.multiply(X_train).sum(axis=1))
+X_train = vec.transform(sms["text"]).tocsr()
 y_train = sms["label"]
 
+# The labels are categorical, so each one is stored as an integer code
+# (0 for "ham", 1 for "spam"). The votes of the neighbors can be tallied by
+# counting their codes with np.bincount(), and label_names turns the winning
+# code back into a label.
+label_codes = y_train.cat.codes.to_numpy()
+label_names = y_train.cat.categories
+
+# The lengths of the training vectors do not depend on the new text,
+# so we calculate them once, instead of on every call to predict_spam().
+X_train_sqnorm = np.asarray(X_train.multiply(X_train).sum(axis=1)).ravel()
+X_train_len = np.sqrt(X_train_sqnorm)
+
 def predict_spam(new_text):
     # Get the TF-IDF vector for the new text.
-    x_new = vec.transform([new_text])[0, :]
+    x_new = vec.transform([new_text]).tocsr()
     raise NotImplementedError
     
 print(predict_spam("meet you at jurong place"))
@@ -51,16 +51,16 @@ housing_df.plot.scatter(x="Gr Liv Area", y="SalePrice",
 
 # Notice how the colors become darker as you move down the plot. This means that, holding living area constant, a house is less expensive the _more_ bedrooms it has. (Why do you think this is?)
 #
-# Now, number of bedrooms is a quantitative variable. What if we wanted to visualize how a categorical variable, such as building type, interacts with these two quantitative variables (living area and sale price)? We have to manually construct the array of colors using the `.map()` function we learned in Chapter 1.
+# Now, number of bedrooms is a quantitative variable. What if we wanted to visualize how a categorical variable, such as building type, interacts with these two quantitative variables (living area and sale price)? We have to manually construct the array of colors. We could use the `.map()` function we learned in Chapter 1, but that looks up the color of each house one at a time. Instead, we convert building type to a categorical variable, which stores each house's building type as an integer code (0 for the first category, 1 for the second, and so on). Then we can look up all of the colors at once by indexing an array of colors with these codes.
 
 # +
-cols = housing_df["Bldg Type"].map({
-    "1Fam": "blue",
-    "TwnhsE": "green",
-    "Twnhs": "green",
-    "Duplex": "red",
-    "2fmCon": "orange"
-})
+import numpy as np
+
+bldg_type = pd.Categorical(housing_df["Bldg Type"],
+                           categories=["1Fam", "TwnhsE", "Twnhs", "Duplex", "2fmCon"])
+# Building types not listed above get the code -1, i.e., the last color.
+palette = np.array(["blue", "green", "green", "red", "orange", "gray"])
+cols = palette[bldg_type.codes]
 
 housing_df.plot.scatter(x="Gr Liv Area", y="SalePrice", 
                         c=cols, alpha=.3)
@@ -76,9 +76,9 @@ housing_df.plot.scatter(x="Gr Liv Area", y="SalePrice",
 # Specifies a 1 x 5 grid of plots, figsize in inches
 fig, axes = plt.subplots(1, 5, figsize=(10, 4))
 
-bldg_types = housing_df["Bldg Type"].unique()
-for ax, bldg_type in zip(axes, bldg_types):
-    housing_type = housing_df[housing_df["Bldg Type"] == bldg_type]
+# Split the data by building type in one pass, rather than filtering it
+# once for each building type.
+for ax, (bldg_type, housing_type) in zip(axes, housing_df.groupby("Bldg Type", sort=False)):
     housing_type.plot.scatter(x="Gr Liv Area", y="SalePrice", ax=ax)
     ax.set_title(bldg_type)
 # -
@@ -88,9 +88,7 @@ for ax, bldg_type in zip(axes, bldg_types):
 # +
 fig, axes = plt.subplots(1, 5, figsize=(10, 4), sharey=True)
 
-bldg_types = housing_df["Bldg Type"].unique()
-for ax, bldg_type in zip(axes, bldg_types):
-    housing_type = housing_df[housing_df["Bldg Type"] == bldg_type]
+for ax, (bldg_type, housing_type) in zip(axes, housing_df.groupby("Bldg Type", sort=False)):
     housing_type.plot.scatter(x="Gr Liv Area", y="SalePrice", ax=ax)
     ax.set_title(bldg_type)
 # -
@@ -102,16 +100,22 @@ for ax, bldg_type in zip(axes, bldg_types):
 # The **grammar of graphics** organizes the ideas above into a coherent philosophy. The key insight is that a graphic can be specified by mapping its "aesthetics" (e.g., color, size, $x$-axis, column facet) to variables in a data set. Although `pandas` provides some support for this philosophy (as we have seen above), the process is tedious and often requires writing boilerplate code. For example, in order to use color to represent building type, we had to manually map each building type to a color. Libraries based on the grammar of graphics provide a more friendly interface and hide this complexity from the user.
 #
 # Software packages that implement the grammar of graphics include `ggplot2` in R and [Altair](https://altair-viz.github.io/) in Python. Since we are working in Python, we will use Altair. The first step is to import the package.
+#
+# Altair stores a copy of the data inside every chart that it draws. The housing data set has over 80 columns, but we only plan to plot a few of them, so we will give Altair a `DataFrame` with just those columns.
 
+# +
 from altair import *
 
+plot_df = housing_df[["Gr Liv Area", "SalePrice", "Bedroom AbvGr", "Bldg Type"]]
+# -
+
 # Now, let's use Altair to recreate the scatterplot from earlier, where each point was colored according to the number of bedrooms.
 #
 # Every Altair command starts with `Chart(your_data_frame)`, followed by the two main elements of the graphic:
 # - the mark (i.e., the geometric object being plotted, which for a scatterplot, is a circle)
 # - the encoding channels (i.e., mappings between aesthetics and variables)
 
-Chart(housing_df).mark_circle().encode(
+Chart(plot_df).mark_circle().encode(
     x="Gr Liv Area",
     y="SalePrice",
     color="Bedroom AbvGr"
@@ -119,7 +123,7 @@ Chart(housing_df).mark_circle().encode(
 
 # Now, what if we replace the number of bathrooms, a quantitative variable, with building type, a categorical variable?
 
-Chart(housing_df).mark_circle().encode(
+Chart(plot_df).mark_circle().encode(
     x="Gr Liv Area",
     y="SalePrice",
     color="Bldg Type"
@@ -129,7 +133,7 @@ Chart(housing_df).mark_circle().encode(
 
 # On the other hand, if we had wanted to have building type be a column facet, using small multiples to show the different building types, we would map the `column` aesthetic to building type:
 
-Chart(housing_df).mark_circle().encode(
+Chart(plot_df).mark_circle().encode(
     x="Gr Liv Area",
     y="SalePrice",
     column="Bldg Type"
@@ -141,7 +145,7 @@ Chart(housing_df).mark_circle().encode(
 #
 # For example, suppose we wanted the $x$-axis limits to range from 0 to 4000 and the tick labels on the $y$-axis to display numbers in scientific notation (i.e., 2e+5 instead of 200,000). Here's how we could achieve those customizations in Altair:
 
-Chart(housing_df).mark_circle().encode(
+Chart(plot_df).mark_circle().encode(
     x=X("Gr Liv Area", scale=Scale(domain=(0, 4000))),
     y=Y("SalePrice", axis=Axis(format="e")),
     column="Bldg Type"
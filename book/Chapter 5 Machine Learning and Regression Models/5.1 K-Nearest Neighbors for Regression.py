@@ -54,7 +54,7 @@ import numpy as np
 import pandas as pd
 pd.options.display.max_rows = 5
 
-housing = pd.read_csv("https://raw.githubusercontent.com/dlsun/data-science-book/master/data/AmesHousing.txt", sep="\t")
+housing = pd.read_csv("https://raw.githubusercontent.com/dlsun/data-science-book/master/data/AmesHousing.txt", sep="\t", engine="pyarrow")
 housing
 # -
 
@@ -134,52 +134,79 @@ features = ["Lot Area", "Gr Liv Area",
             "Year Built", "Date Sold",
             "Neighborhood"]
 
-# Note that "Neighborhood" is a categorical variable.
-X_train = pd.get_dummies(housing[features])
+# Note that "Neighborhood" is a categorical variable. Each house has a 1
+# in just one of its dummy variables, so we store them as a sparse matrix.
+from sklearn.preprocessing import OneHotEncoder
+
+numeric_features = features[:-1]
+encoder = OneHotEncoder(sparse_output=True)
+X_train_numeric = housing[numeric_features]
+X_train_dummies = encoder.fit_transform(housing[["Neighborhood"]])
+columns = numeric_features + list(encoder.get_feature_names_out())
 y_train = housing["SalePrice"]
 # -
 
-# Suppose an assessor is trying to predict the fair value in 2011 of a 1400-square foot home built in 1980 with 3 bedrooms, 2 full baths, and 1 half bath, on a 9000 square-foot lot in the `OldTown` neighborhood. Let's create the `pandas` `Series` corresponding to this house. Remember that we have dummy variables for each neighborhood. We have to be sure to include these dummy variables in the new `Series` as well. The easiest way to do this is to initialize the index of the `Series` to match the columns of `X_train` above.
+# Suppose an assessor is trying to predict the fair value in 2011 of a 1400-square foot home built in 1980 with 3 bedrooms, 2 full baths, and 1 half bath, on a 9000 square-foot lot in the `OldTown` neighborhood. Let's create the array of features corresponding to this house. Remember that we have dummy variables for each neighborhood. We have to be sure to include these dummy variables in the new array as well. The easiest way to do this is to start with an array of zeros, one for each of the features (including the dummy variables), and then fill in the values that we know. To look up where each feature goes in the array, we make a dictionary that maps the name of each feature to its position.
 
-X_train.columns
+columns
 
 # +
-# Initialize a Series of NaNs, indexed by the columns of X_train
-x_new = pd.Series(index=X_train.columns)
+# Map the name of each feature to its position in the array.
+col_idx = {col: i for i, col in enumerate(columns)}
+
+# Initialize an array of zeros, one for each feature. The dummy variables
+# for the other neighborhoods will keep the value 0.
+x_new = np.zeros(len(columns), dtype=np.float32)
 
 # Set the values of the known variables.
-x_new["Lot Area"] = 9000
-x_new["Gr Liv Area"] = 1400
-x_new["Full Bath"] = 2
-x_new["Half Bath"] = 1
-x_new["Bedroom AbvGr"] = 3
-x_new["Year Built"] = 1980
-x_new["Date Sold"] = 2011
+x_new[col_idx["Lot Area"]] = 9000
+x_new[col_idx["Gr Liv Area"]] = 1400
+x_new[col_idx["Full Bath"]] = 2
+x_new[col_idx["Half Bath"]] = 1
+x_new[col_idx["Bedroom AbvGr"]] = 3
+x_new[col_idx["Year Built"]] = 1980
+x_new[col_idx["Date Sold"]] = 2011
 
 # This house is in Old Town, so its dummy variable has value 1.
-x_new["Neighborhood_OldTown"] = 1
-# The dummy variables for the other neighborhoods all have value 0.
-x_new.fillna(0, inplace=True)
+x_new[col_idx["Neighborhood_OldTown"]] = 1
 
-x_new
+# Display the array with the feature names.
+pd.Series(x_new, index=columns)
 # -
 
-# Now we can implement $k$-nearest neighbors much as we did above.
+# Now we can implement $k$-nearest neighbors much as we did above. There is one twist: subtracting the mean from the dummy variables would turn all of their 0s into non-zero numbers, so the matrix would no longer be sparse. Fortunately, we do not need to. Shifting every house by the same amount does not change the distances between them, so it is enough to divide the dummy variables by their standard deviations. (A dummy variable where a proportion $p$ of the houses are 1s has variance $p(1 - p)$, up to a factor of $n / (n - 1)$.)
 
 # +
-# Standardize the variables.
-X_train_mean = X_train.mean()
-X_train_std = X_train.std()
-
-X_train_sc = (X_train - X_train_mean) / X_train_std
-x_new_sc = (x_new - X_train_mean) / X_train_std
-
-# Find index of 30 nearest neighbors.
-dists = np.sqrt(((X_train_sc - x_new_sc) ** 2).sum(axis=1))
-i_nearest = dists.sort_values()[:30].index
+from scipy.sparse import csr_matrix, hstack
+
+# Standardize the variables. The numeric features come first in x_new.
+n_numeric = len(numeric_features)
+X_train_mean = X_train_numeric.mean().to_numpy()
+X_train_std = X_train_numeric.std().to_numpy()
+
+n = X_train_dummies.shape[0]
+p = np.asarray(X_train_dummies.mean(axis=0)).ravel()
+dummies_std = np.sqrt(p * (1 - p) * n / (n - 1))
+
+# Standardized features do not need double precision.
+X_train_sc = hstack([
+    csr_matrix((X_train_numeric.to_numpy() - X_train_mean) / X_train_std),
+    X_train_dummies.multiply(1 / dummies_std)
+], format="csr", dtype=np.float32)
+x_new_sc = np.concatenate([
+    (x_new[:n_numeric] - X_train_mean) / X_train_std,
+    x_new[n_numeric:] / dummies_std
+]).astype(np.float32)
+
+# Find index of 30 nearest neighbors. Instead of subtracting x_new_sc
+# from every row, expand ||a - b||^2 = ||a||^2 - 2 a.b + ||b||^2,
+# so that the only work per training row is one matrix-vector product.
+train_sqnorms = np.asarray(X_train_sc.multiply(X_train_sc).sum(axis=1)).ravel()
+dists2 = train_sqnorms - 2.0 * X_train_sc.dot(x_new_sc) + x_new_sc @ x_new_sc
+i_nearest = np.argpartition(dists2, 30)[:30]
 
 # Average the labels of these 30 nearest neighbors
-y_train.loc[i_nearest].mean()
+y_train.iloc[i_nearest].mean()
 # -
 
 # So the model predicts that this house is worth \$132,343.
@@ -200,20 +227,28 @@ X_new["Gr Liv Area"] = np.arange(0, 6000, 10)
 X_new
 
 
-# Next, we will define a function `get_30NN_prediction` that implements the 30-nearest neighbor algorithm above: given a new observation, it returns the mean label of the 30-nearest neighbors to that observation.
+# Next, we will define a function `get_30NN_predictions` that implements the 30-nearest neighbor algorithm above: given a `DataFrame` of new observations, it returns the mean label of the 30-nearest neighbors to each observation.
+#
+# We actually have 600 new observations in `X_new`. We could calculate the distance from each of them to every one of the houses in the training data, but that is a lot of wasted work: to predict for a 1000 square foot house, there is no need to look at the 5000 square foot houses at all.
+#
+# A **$k$-d tree** avoids this work. It organizes the training data once, so that each search for nearest neighbors only has to look at the part of the feature space near the new observation. SciPy's `cKDTree` builds such a tree, and its `.query()` method finds the $k$ nearest neighbors of every new observation at once. It returns a matrix of indices, with one row per new observation and one column per neighbor. (The $k$-d tree works best when there are only a few features, like here. With dozens of features, like in the model above, it is no faster than calculating all of the distances.)
 
-def get_30NN_prediction(x_new):
-    """Given new observation, returns 30-nearest neighbors prediction
-    """
-    dists = ((X_train - x_new) ** 2).sum(axis=1)
-    inds_sorted = dists.sort_values().index[:30]
-    return y_train.loc[inds_sorted].mean()
+# +
+from scipy.spatial import cKDTree
 
+y_train_arr = y_train.to_numpy(dtype=np.float64)
+# Build the tree once from the training data.
+tree = cKDTree(X_train.to_numpy(dtype=np.float64))
 
-# We actually have 600 new observations in `X_new`. Let's apply this function to each new observation.
+def get_30NN_predictions(X_new):
+    """Given new observations, returns 30-nearest neighbors predictions
+    """
+    _, inds_nearest = tree.query(X_new.to_numpy(dtype=np.float64), k=30, workers=-1)
+    return pd.Series(y_train_arr[inds_nearest].mean(axis=1), index=X_new.index)
 
-y_new_pred = X_new.apply(get_30NN_prediction, axis=1)
+y_new_pred = get_30NN_predictions(X_new)
 y_new_pred
+# -
 
 # We want to plot these predictions as a curve (`.plot.line()`). `pandas` will plot the index of the `Series` on the `x`-axis, so we have to set the index appropriately.
 
@@ -32,7 +32,7 @@ import pandas as pd
 pd.options.display.max_rows = 5
 
 housing = pd.read_csv("https://raw.githubusercontent.com/dlsun/data-science-book/master/data/AmesHousing.txt",
-                      sep="\t")
+                      sep="\t", engine="pyarrow")
 
 housing["Date Sold"] = housing["Yr Sold"] + housing["Mo Sold"] / 12
 features = ["Lot Area", "Gr Liv Area",
@@ -149,7 +149,7 @@ X_train_sc
 # +
 # Read in the data.
 housing = pd.read_csv("https://raw.githubusercontent.com/dlsun/data-science-book/master/data/AmesHousing.txt", 
-                      sep="\t")
+                      sep="\t", engine="pyarrow")
 
 # Define the features.
 housing["Date Sold"] = housing["Yr Sold"] + housing["Mo Sold"] / 12
@@ -24,7 +24,7 @@ import pandas as pd
 pd.options.display.max_rows = 5
 
 housing = pd.read_csv("https://raw.githubusercontent.com/dlsun/data-science-book/master/data/AmesHousing.txt",
-                      sep="\t")
+                      sep="\t", engine="pyarrow")
 housing
 # -
 
@@ -25,8 +25,25 @@ import numpy as np
 import pandas as pd
 pd.options.display.max_rows = 5
 
-housing = pd.read_csv("https://raw.githubusercontent.com/dlsun/data-science-book/master/data/AmesHousing.txt",
-                      sep="\t")
+import hashlib
+from pathlib import Path
+
+def cached_table(url, **kwargs):
+    # Parse the file the first time it is requested and save the result in
+    # Parquet format, which is much faster to read back than text.
+    key = url + repr(sorted(kwargs.items()))
+    path = Path(
+        "~/.cache/ds-book", hashlib.sha1(key.encode()).hexdigest() + ".parquet"
+    ).expanduser()
+    if not path.exists():
+        path.parent.mkdir(parents=True, exist_ok=True)
+        partial = path.with_suffix(".part")
+        pd.read_csv(url, **kwargs).to_parquet(partial)
+        partial.replace(path)
+    return pd.read_parquet(path)
+
+housing = cached_table("https://raw.githubusercontent.com/dlsun/data-science-book/master/data/AmesHousing.txt",
+                       sep="\t", engine="pyarrow")
 housing
 # -
 
@@ -48,18 +65,20 @@ housing
 #
 # The prediction error on the validation set is known as the **validation error**. The validation error is an approximation to the test error.
 
-# To split our data into training and validation sets, we use the `.sample()` function in `pandas`. Let's use this to split our data into two equal halves, which we will call `train` and `val`.
+# To split our data into training and validation sets, we shuffle the row positions with `np.random.permutation()`. Then the first half of the shuffled positions go into the training set and the second half into the validation set. Let's use this to split our data into two equal halves, which we will call `train` and `val`.
 
 # +
-train = housing.sample(frac=.5)
-val = housing.drop(train.index)
+idx = np.random.permutation(len(housing))
+half = len(housing) // 2
+train = housing.iloc[idx[:half]]
+val = housing.iloc[idx[half:]]
 
 train
 # -
 
 # Now let's use this training/validation split to approximate the test error of a 10-nearest neighbors model.
 
-# First, we extract the variables we need.
+# First, we extract the variables we need. `Neighborhood` is a categorical variable, so we convert it to dummy variables using `pd.get_dummies()`. The dummy variables only depend on which neighborhoods appear in the data, not on the sale prices, so we can create them for all of the data at once and then split them. This way, the training and validation sets are guaranteed to have the same columns.
 
 # +
 # Features in our model. All quantitative, except Neighborhood.
@@ -69,27 +88,30 @@ features = ["Lot Area", "Gr Liv Area",
             "Year Built", "Yr Sold",
             "Neighborhood"]
 
-X_train_dict = train[features].to_dict(orient="records")
-X_val_dict = val[features].to_dict(orient="records")
+X = pd.get_dummies(housing[features], columns=["Neighborhood"], dtype=np.float32)
+X_train = X.iloc[idx[:half]]
+X_val = X.iloc[idx[half:]]
 
-y_train = train["SalePrice"]
-y_val = val["SalePrice"]
+# We only need the prices themselves (not the index), so we store them as
+# NumPy arrays. Then arithmetic on them does not have to align indexes.
+y_train = train["SalePrice"].to_numpy()
+y_val = val["SalePrice"].to_numpy()
 # -
 
-# Next, we use Scikit-Learn to preprocess the training and the validation data. Note that the vectorizer and the scaler are both fit to the training data, so we learn the categories, the mean, and standard deviation from the training set---and use these to transform both the training and validation sets.
+# Next, we use Scikit-Learn to standardize the training and the validation data. Note that the scaler is fit to the training data, so we learn the mean and standard deviation from the training set---and use these to transform both the training and validation sets.
+#
+# Each house is in exactly one neighborhood, so almost all of the dummy variables are 0. We store the data as a sparse matrix, which only stores the non-zero values. To keep the matrix sparse, we tell the scaler not to subtract the mean (`with_mean=False`). This does not change the model at all: shifting every observation by the same amount does not change the distances between them. Finally, we store the values in single precision (`np.float32`), which uses half the memory of the default double precision. Single precision is accurate enough for _storing_ the features, but not for every calculation with them. Because the features are not centered, the squared length of each observation is in the millions, so the squared lengths that go into the distances must be calculated in double precision. (Scikit-Learn does this on its own; when we calculate the distances ourselves below, we have to do it too.)
 
 # +
-from sklearn.feature_extraction import DictVectorizer
+from scipy.sparse import csr_matrix
 from sklearn.preprocessing import StandardScaler
 
-# convert categorical variables to dummy variables
-vec = DictVectorizer(sparse=False)
-vec.fit(X_train_dict)
-X_train = vec.transform(X_train_dict)
-X_val = vec.transform(X_val_dict)
+# store the data as sparse matrices
+X_train = csr_matrix(X_train.to_numpy(dtype=np.float32))
+X_val = csr_matrix(X_val.to_numpy(dtype=np.float32))
 
 # standardize the data
-scaler = StandardScaler()
+scaler = StandardScaler(with_mean=False)
 scaler.fit(X_train)
 X_train_sc = scaler.transform(X_train)
 X_val_sc = scaler.transform(X_val)
@@ -100,17 +122,50 @@ X_val_sc = scaler.transform(X_val)
 # +
 from sklearn.neighbors import KNeighborsRegressor
 
-# Fit a 10-nearest neighbors model.
-model = KNeighborsRegressor(n_neighbors=10)
+# Fit a 10-nearest neighbors model. Brute force calculates all of the
+# distances with sparse matrix products (k-d trees require dense data),
+# and n_jobs=-1 spreads the queries over all of the CPU cores.
+model = KNeighborsRegressor(n_neighbors=10, algorithm="brute",
+                            metric="euclidean", n_jobs=-1)
 model.fit(X_train_sc, y_train)
 # -
 
 # We make predictions on the validation set and calculate the validation RMSE:
 
+# The dot product of the residuals with themselves is their sum of squares.
 y_val_pred = model.predict(X_val_sc)
-rmse = np.sqrt(((y_val - y_val_pred) ** 2).mean())
+diff = y_val - y_val_pred
+rmse = np.sqrt(np.dot(diff, diff) / diff.size)
 rmse
 
+# To see what `KNeighborsRegressor` is doing, let's make the same predictions ourselves. First, we need the distance between every validation observation and every training observation. If we expand the squared distance as $\|{\bf a} - {\bf b}\|^2 = \|{\bf a}\|^2 - 2\,{\bf a} \cdot {\bf b} + \|{\bf b}\|^2$, then all of the dot products can be calculated with one matrix multiplication, which is what `euclidean_distances()` does. The squared lengths $\|{\bf a}\|^2$ and $\|{\bf b}\|^2$ only have to be calculated once, so we calculate them ourselves and pass them in. Our data is stored in single precision, but `euclidean_distances()` only uses squared lengths that are given in double precision (otherwise it recalculates them), so we calculate them from a double-precision copy of the data. (Because the features are not centered, the squared lengths are in the millions, while the distances between neighbors are small. In single precision, the rounding errors in the squared lengths would be larger than the differences between the distances.) We also ask for squared distances (`squared=True`), since taking square roots does not change which training observations are the closest.
+#
+# Then, for each validation observation, `np.argpartition()` finds the 10 training observations with the smallest distances, without sorting all of the distances. The predicted price is the average price of these 10 neighbors.
+
+# +
+from sklearn.metrics.pairwise import euclidean_distances
+
+def squared_norms(X):
+    # The squared length of each observation, in double precision.
+    X = X.astype(np.float64)
+    return np.asarray(X.multiply(X).sum(axis=1)).ravel()
+
+train_norms = squared_norms(X_train_sc)
+val_norms = squared_norms(X_val_sc)
+
+# dists[i, j] is the squared distance between validation observation i and
+# training observation j.
+dists = euclidean_distances(X_val_sc, X_train_sc,
+                            X_norm_squared=val_norms[:, np.newaxis],
+                            Y_norm_squared=train_norms[np.newaxis, :],
+                            squared=True)
+nn_idx = np.argpartition(dists, 10, axis=1)[:, :10]
+y_val_pred_by_hand = y_train[nn_idx].mean(axis=1)
+
+# This should be (essentially) 0.
+np.abs(y_val_pred_by_hand - y_val_pred).max()
+# -
+
 
 # Notice that the test error is higher than the training error that we calculated in the previous section. In general, this will be true. It is harder for a model to predict for new observations it has not seen, than for observations it has seen!
 
@@ -126,31 +181,30 @@ rmse
 #
 # Because we will be doing all computations twice, just with different data, let's wrap the $k$-nearest neighbors algorithm above into a function called `get_val_error()`, that computes the validation error given training and validation data.
 
+# +
+from sklearn.pipeline import make_pipeline
+
 def get_val_error(X_train, y_train, X_val, y_val):
     
-    # convert categorical variables to dummy variables
-    vec = DictVectorizer(sparse=False)
-    vec.fit(X_train_dict)
-    X_train = vec.transform(X_train_dict)
-    X_val = vec.transform(X_val_dict)
-
-    # standardize the data
-    scaler = StandardScaler()
-    scaler.fit(X_train)
-    X_train_sc = scaler.transform(X_train)
-    X_val_sc = scaler.transform(X_val)
-    
-    # Fit a 10-nearest neighbors model.
-    model = KNeighborsRegressor(n_neighbors=10)
-    model.fit(X_train_sc, y_train)
+    # Chain together the steps from above: standardize the data and fit a
+    # 10-nearest neighbors model. Both steps are fit to the training data only.
+    pipe = make_pipeline(
+        StandardScaler(with_mean=False),
+        KNeighborsRegressor(n_neighbors=10, algorithm="brute",
+                            metric="euclidean", n_jobs=-1)
+    )
+    pipe.fit(X_train, y_train)
     
     # Make predictions on the validation set.
-    y_val_pred = model.predict(X_val_sc)
-    rmse = np.sqrt(((y_val - y_val_pred) ** 2).mean())
+    y_val_pred = pipe.predict(X_val)
+    diff = y_val - y_val_pred
+    rmse = np.sqrt(np.dot(diff, diff) / diff.size)
     
     return rmse
 
 
+# -
+
 # If we apply this function to the training and test sets from earlier, we get the same estimate of the test error.
 
 get_val_error(X_train, y_train, X_val, y_val)
@@ -160,6 +214,27 @@ get_val_error(X_train, y_train, X_val, y_val)
 get_val_error(X_val, y_val, X_train, y_train)
 
 # Now we have two, somewhat independent estimates of the test error. It is common to average the two to obtain an overall estimate of the test error, called the **cross-validation error**. Notice that the cross-validation error uses each observation in the data exactly once. We make a prediction for each observation, but always using a model that was trained on data that does not include that observation.
+#
+# Scikit-Learn can do all of this work for us. `cross_val_score()` takes a pipeline, like the one in `get_val_error()`, and fits and evaluates it on each of the folds. The `KFold` object shuffles the observations and splits them into folds; setting `random_state` makes the split the same every time we run the cell. Since the folds have nothing to do with each other, `n_jobs=-1` computes them at the same time, on different CPU cores. Nothing here is specific to two folds: to use more, just change `n_splits`.
+#
+# Scikit-Learn always reports scores where higher is better, so it reports the RMSE with a negative sign. We flip the sign back before averaging.
+
+# +
+from sklearn.model_selection import KFold, cross_val_score
+
+pipe = make_pipeline(
+    StandardScaler(with_mean=False),
+    KNeighborsRegressor(n_neighbors=10, algorithm="brute", metric="euclidean")
+)
+
+scores = cross_val_score(pipe,
+                         csr_matrix(X.to_numpy(dtype=np.float32)),
+                         housing["SalePrice"],
+                         cv=KFold(n_splits=2, shuffle=True, random_state=0),
+                         scoring="neg_root_mean_squared_error",
+                         n_jobs=-1)
+-scores.mean()
+# -
 
 # # Exercises
 
@@ -170,6 +245,8 @@ get_val_error(X_val, y_val, X_train, y_train)
 # -
 
 # **Exercise 2.** Using the Tips data set (`https://raw.githubusercontent.com/dlsun/data-science-book/master/data/tips.csv`), train $k$-nearest neighbors regression models to predict the tip for different values of $k$. Calculate the training and validation MAE of each model, and make a plot showing these errors as a function of $k$.
+#
+# (_Hint:_ You do not need to recompute the distances for every value of $k$. If `X_train_sc` and `X_val_sc` are NumPy arrays of standardized features, then `((X_val_sc[:, None, :] - X_train_sc[None, :, :]) ** 2).sum(axis=-1)` uses broadcasting to compute the squared distance from every validation observation to every training observation at once, without a Python loop. Sort each row of this matrix once with `.argsort(axis=1)`. The $k$ nearest neighbors of each observation are then in the first $k$ columns, for every $k$. The broadcast creates an intermediate array with one entry for every validation observation, training observation, and feature. That is no problem for a data set as small as Tips. For larger data, expand the square instead: `(X_val_sc ** 2).sum(axis=1)[:, None] + (X_train_sc ** 2).sum(axis=1)[None, :] - 2 * X_val_sc @ X_train_sc.T`.)
 
 # +
 # YOUR CODE HERE
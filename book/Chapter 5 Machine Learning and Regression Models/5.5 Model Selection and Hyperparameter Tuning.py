@@ -29,7 +29,7 @@ import pandas as pd
 pd.options.display.max_rows = 5
 
 housing = pd.read_csv("https://raw.githubusercontent.com/dlsun/data-science-book/master/data/AmesHousing.txt",
-                      sep="\t")
+                      sep="\t", engine="pyarrow")
 housing
 # -
 
@@ -82,8 +82,10 @@ X_dict = housing[features].to_dict(orient="records")
 y = housing["SalePrice"]
 
 # specify the pipeline
+# (the vectorizer creates a new array every time, so the scaler can
+# standardize that array in place, instead of copying it)
 vec = DictVectorizer(sparse=False)
-scaler = StandardScaler()
+scaler = StandardScaler(copy=False)
 model = KNeighborsRegressor(n_neighbors=10)
 pipeline = Pipeline([("vectorizer", vec), ("scaler", scaler), ("fit", model)])
 # -
@@ -114,7 +116,7 @@ np.sqrt(np.mean(-scores))
 
 # +
 vec = DictVectorizer(sparse=False)
-scaler = StandardScaler()
+scaler = StandardScaler(copy=False)
 
 # calculates estimate of test error based on 10-fold cross validation
 def get_cv_error(k):
@@ -141,7 +143,7 @@ test_errs.sort_values()
 # Suppose we are not sure whether `Yr Sold` should be included in the $4$-nearest neighbors model or not. To determine whether or not it should be included, we can fit a model with `Yr Sold` included and another model with it excluded, and see which model has the better (test) MSE.
 
 vec = DictVectorizer(sparse=False)
-scaler = StandardScaler()
+scaler = StandardScaler(copy=False)
 model = KNeighborsRegressor(n_neighbors=4)
 pipeline = Pipeline([("vectorizer", vec), ("scaler", scaler), ("fit", model)])
 
@@ -79,19 +79,21 @@ centroids
 
 # -
 
-# Now we assign each point to the cluster of its nearest centroid.
+# Now we assign each point to the cluster of its nearest centroid. The `cdist()` function in SciPy calculates the distance between every point and every centroid at once, returning a matrix with one row per point and one column per centroid. We ask for _squared_ Euclidean distances (`"sqeuclidean"`), since the square root does not change which centroid is nearest.
 
 # +
-# Finds the nearest centroid to a given observation.
-def get_nearest_centroid(obs):
-    dists = np.sqrt(((obs - centroids) ** 2).sum(axis=1))
-    return dists.idxmin()
+from scipy.spatial.distance import cdist
 
-get_nearest_centroid(X_train.loc[0])
+# Finds the nearest centroid to each observation.
+def get_nearest_centroids(X):
+    dists = cdist(X, centroids, metric="sqeuclidean")
+    return pd.Series(centroids.index[dists.argmin(axis=1)], index=X.index)
+
+get_nearest_centroids(X_train.loc[[0]])
 
 # +
 # Apply the function to the entire data set.
-clusters = X_train.apply(get_nearest_centroid, axis=1)
+clusters = get_nearest_centroids(X_train)
 
 # Plot the cluster assignments.
 ax = X_train.plot.scatter(x="PetalLength", y="PetalWidth", 
@@ -119,7 +121,7 @@ centroids
 
 # +
 # Assign points to their nearest centroid.
-clusters = X_train.apply(get_nearest_centroid, axis=1)
+clusters = get_nearest_centroids(X_train)
 
 # Recalculate the centroids based on the clusters.
 centroids = X_train.groupby(clusters).mean()